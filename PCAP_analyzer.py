@@ -1,124 +1,207 @@
+import array
+import mmap
+import os
 import struct
 import socket
+import sys
+from collections import deque
+
+#Header layouts compiled once, so the packet loop doesn't reparse format strings
+_PKT_HDR = struct.Struct('=IIII')           #ts_sec, ts_usec, incl_len, orig_len
+_IPV4 = struct.Struct('!H8xII')             #total length, (skipped fields), source and destination address
+_TCP = struct.Struct('!HHLLHH')             #ports, seq, ack, offset/flags, window
+
+class Connection:
+    #Per-connection state. __slots__ keeps each record compact and turns every
+    #field access into a fixed-offset load instead of a string-keyed dict lookup
+    __slots__ = (
+        'start_time', 'end_time', 'packets', 'bytes',
+        'win_min', 'win_max', 'win_sum',
+        'rtt_min', 'rtt_max', 'rtt_sum', 'rtt_n',
+        'syn_count', 'fin_count', 'reset', 'rtt_side', 'unacknowledged',
+    )
+
+    def __init__(self):
+        self.start_time = None
+        self.end_time = None
+        self.packets = [0, 0] #[source to destination, destination to source]
+        self.bytes = [0, 0]
+        #Running min/max/sum instead of keeping every sample. Every packet
+        #carries one window size, so the packet counts double as win_n
+        self.win_min = 65536
+        self.win_max = 0
+        self.win_sum = 0
+        self.rtt_min = float('inf')
+        self.rtt_max = float('-inf')
+        self.rtt_sum = 0.0
+        self.rtt_n = 0
+        self.syn_count = 0
+        self.fin_count = 0
+        self.reset = False
+        #Direction whose bare sends are timed for RTT: whichever side sent the first
+        #packet without ACK (normally the client's SYN), not the lower endpoint of the key
+        self.rtt_side = None
+        self.unacknowledged = deque()  # (seq, send time) of unacknowledged packets in send order, for RTT calculation
 
 def parse_pcap(file):
     connections = {}
 
     with open(file, 'rb') as f:
-        f.read(24) #Skipping the global header because it's useless for our assignment
-        start_time = None
-
-        while True:
-            packet_header = f.read(16)
-            if len(packet_header) < 16:
-               break  #End of file
-           
-            #To get the neeeded information of the packet, timestamp in sec, millisec,
-            #the packet data, and the original length 
-            ts_sec, ts_usec, incl_len, orig_len = struct.unpack('=IIII', packet_header) 
-            timestamp = ts_sec + ts_usec / 1_000_000 #adding up the secs and millisecs
-            packet_data = f.read(incl_len)
-            
-            #Setting up time. 
-            if start_time is None:
-                start_time = timestamp
-            relative_time = timestamp - start_time
-            
-            #Checking if the connection is IPv4. If not, then we skip
-            eth_protocol = struct.unpack('!H', packet_data[12:14])[0]
-            if eth_protocol != 0x0800:
-                continue
-
-            #Using the struct module to check if packet is TCP
-            #by looking at the 8th byte of the patcket. If not, we skip
-            ip_header = packet_data[14:34]
-            ip_header_data = struct.unpack('!BBHHHBBH4s4s', ip_header)
-            protocol = ip_header_data[6]
-            if protocol != 6:
-                continue
-
-            #Assigning ip addresses from the ip header we unpacked earlier
-            #Extracting the TCP header, and assigning the designated ports and flags required
-            src_ip = socket.inet_ntoa(ip_header_data[8])
-            dst_ip = socket.inet_ntoa(ip_header_data[9])
-            tcp_header = packet_data[34:54]
-            src_port, dst_port, seq, ack_seq, offset_reserved_flags = struct.unpack('!HHLLH', tcp_header[:14])
-            flags = offset_reserved_flags & 0x3F
-
-            syn_flag = (flags & 0x02) != 0
-            fin_flag = (flags & 0x01) != 0
-            rst_flag = (flags & 0x04) != 0
-            ack_flag = (flags & 0x10) != 0
-
-
-            #Assigning the source ip address and destination ip address 
-            if (src_ip, src_port) < (dst_ip, dst_port):
-                connection_key = (src_ip, src_port, dst_ip, dst_port)
-                direction = 'src_to_dst'
-            else:
-                connection_key = (dst_ip, dst_port, src_ip, src_port)
-                direction = 'dst_to_src'
-
-
-            #Initializing the dictionary for the connections
-            if connection_key not in connections:
-                connections[connection_key] = {
-                    'start_time': None,
-                    'end_time': None,
-                    'packets_src_to_dst': 0,
-                    'packets_dst_to_src': 0,
-                    'bytes_src_to_dst': 0,
-                    'bytes_dst_to_src': 0,
-                    'window_sizes': [],
-                    'rtt_times': [],
-                    'syn_count': 0,
-                    'fin_count': 0,
-                    'reset': False,
-                    'is_complete': False,
-                    'unacknowledged': {}  # Store unacknowledged packets for RTT calculation
-                }
-
-            conn = connections[connection_key]
-
-            #Update flags and timings
-            if syn_flag:
-                conn['syn_count'] += 1
-                if conn['start_time'] is None:
-                    conn['start_time'] = relative_time
-            if fin_flag:
-                conn['fin_count'] += 1
-                conn['end_time'] = relative_time
-            if rst_flag:
-                conn['reset'] = True
-
-            #Calculate RTT using the first matching ACK
-            if direction == 'src_to_dst' and not ack_flag:
-                conn['unacknowledged'][seq] = relative_time
+        #mmap refuses to map an empty file, and there is nothing to parse in it anyway
+        if os.fstat(f.fileno()).st_size == 0:
+            return connections
+
+        #Telling the kernel the file is read front to back widens its readahead, so disk
+        #reads overlap with parsing instead of stalling on each page fault
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        #Mapping the whole file lets us walk it with a cursor instead of calling
+        #f.read() (a syscall plus a bytes copy) twice for every packet
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL) #We read front to back, so let the kernel prefetch
+            size = len(mm)
+            pos = 24 #Skipping the global header because it's useless for our assignment
+            start_time = None
+
+            #Binding the unpackers to locals once, so each packet skips the global
+            #and attribute lookups to reach them
+            unpack_pkt_hdr = _PKT_HDR.unpack_from
+            unpack_ipv4 = _IPV4.unpack_from
+            unpack_tcp = _TCP.unpack_from
+
+            while pos + 16 <= size:
+                #To get the neeeded information of the packet, timestamp in sec, millisec,
+                #the packet data, and the original length 
+                ts_sec, ts_usec, incl_len, orig_len = unpack_pkt_hdr(mv, pos)
+                timestamp = ts_sec + ts_usec / 1_000_000 #adding up the secs and millisecs
+                pkt_start = pos + 16
+                pos = pkt_start + incl_len #Moving the cursor to the next packet header
+                if pos > size:
+                    break  #Truncated last packet
+
+                #Setting up time. 
+                if start_time is None:
+                    start_time = timestamp
+
+                #Checking that the packet is IPv4 (EtherType 0x0800) and TCP (protocol byte
+                #at offset 9 of the IP header) straight from the raw bytes. If not, we skip
+                #before decoding anything else. Frames cut short by the snaplen are skipped
+                #first, since reading their headers would run into the next record
+                if (incl_len < 54 or mv[pkt_start + 12] != 0x08 or mv[pkt_start + 13] != 0x00
+                        or mv[pkt_start + 23] != 6):
+                    continue
+                relative_time = timestamp - start_time
+
+                #Only the total length and addresses are needed from the rest of the IP header.
+                #The addresses stay as 32-bit ints here, output_format turns them into dotted quads
+                ip_total_len, src_ip, dst_ip = unpack_ipv4(mv, pkt_start + 16)
+                #The IP header is 20 bytes only without options, so the TCP header starts
+                #after IHL (low nibble of the first IP byte) 32-bit words
+                ip_header_len = (mv[pkt_start + 14] & 0x0F) * 4
+                #An IHL below 5 words is malformed, and IP options can push the TCP header
+                #past the captured bytes. Either way we skip
+                if ip_header_len < 20 or incl_len < 14 + ip_header_len + 20:
+                    continue
+                #Extracting the TCP header, and assigning the designated ports and flags required
+                src_port, dst_port, seq, ack_seq, offset_reserved_flags, window_size = unpack_tcp(mv, pkt_start + 14 + ip_header_len)
+                flags = offset_reserved_flags & 0x3F
+                tcp_header_len = (offset_reserved_flags >> 12) * 4
+                if tcp_header_len < 20:
+                    continue  #Malformed TCP data offset, it would inflate the payload length
+
+                #Data bytes come from the captured length minus the headers, so the payload itself
+                #is never read. The IP total length only trims Ethernet padding: it is 0 for
+                #segments captured before TCP segmentation offload, so it can't be trusted alone
+                ip_len = min(incl_len - 14, ip_total_len) if ip_total_len else incl_len - 14
+                payload_len = max(0, ip_len - ip_header_len - tcp_header_len)
+                ack_flag = flags & 0x10
+
+                #Packing each endpoint as ip << 16 | port orders them exactly like the
+                #(ip, port) tuples would, but with one int compare. The lower endpoint is
+                #the connection's source. direction is 0 for source to destination and 1
+                #for destination to source, and indexes the per-direction counters below
+                src_endpoint = src_ip << 16 | src_port
+                dst_endpoint = dst_ip << 16 | dst_port
+                direction = int(src_endpoint >= dst_endpoint)
+                #Both 48-bit endpoints are packed into one int key (source high, destination
+                #low), so the dict hashes a single int instead of a tuple of its parts
+                if direction:
+                    connection_key = dst_endpoint << 48 | src_endpoint
+                else:
+                    connection_key = src_endpoint << 48 | dst_endpoint
+
+
+                #One hash lookup for the common case of a connection we've already seen,
+                #instead of a membership test followed by a subscript
+                conn = connections.get(connection_key)
+                if conn is None:
+                    #Initializing the record for new connections
+                    conn = connections[connection_key] = Connection()
+
+                #Update flags and timings. Most packets carry none of SYN, FIN or RST,
+                #so one mask test lets them skip all three checks
+                if flags & 0x07:
+                    if flags & 0x02:
+                        conn.syn_count += 1
+                        if conn.start_time is None:
+                            conn.start_time = relative_time
+                    if flags & 0x01:
+                        conn.fin_count += 1
+                        conn.end_time = relative_time
+                    if flags & 0x04:
+                        conn.reset = True
+
+                #Calculate RTT from the ACKs that cover queued packets
+                if not ack_flag and conn.rtt_side is None:
+                    conn.rtt_side = direction
+
+                if not ack_flag and direction == conn.rtt_side:
+                    #A retransmission replaces the queued send in place instead of adding a
+                    #second entry, so its ACK isn't also timed from the original send. Only
+                    #bare sends are queued, so this stays a short scan
+                    unacknowledged = conn.unacknowledged
+                    for i, (unack_seq, send_time) in enumerate(unacknowledged):
+                        if unack_seq == seq:
+                            unacknowledged[i] = (seq, relative_time)
+                            break
+                    else:
+                        unacknowledged.append((seq, relative_time))
                 
-            elif direction == 'dst_to_src' and ack_flag:
-                #Check if this ACK corresponds to any previously unacknowledged packet
-                for unack_seq, send_time in list(conn['unacknowledged'].items()):
-                    if ack_seq >= unack_seq:
+                elif ack_flag and direction != conn.rtt_side:
+                    #Pop every previously unacknowledged packet this ACK covers, front first
+                    unacknowledged = conn.unacknowledged
+                    if unacknowledged and ack_seq < unacknowledged[0][0]:
+                        #The front may be a send that will never be covered, like an unanswered
+                        #SYN followed by a retry with a smaller ISN, or a wrapped sequence number.
+                        #If a later entry is covered, drop the stale ones ahead of it
+                        for i, (unack_seq, send_time) in enumerate(unacknowledged):
+                            if ack_seq >= unack_seq:
+                                for _ in range(i):
+                                    unacknowledged.popleft()
+                                break
+                    while unacknowledged and ack_seq >= unacknowledged[0][0]:
+                        unack_seq, send_time = unacknowledged.popleft()
                         # Calculate RTT as time difference between packet sent and ACK received
                         rtt = relative_time - send_time
-                        conn['rtt_times'].append(rtt)
-                        del conn['unacknowledged'][unack_seq]
-                        break
+                        if rtt < conn.rtt_min:
+                            conn.rtt_min = rtt
+                        if rtt > conn.rtt_max:
+                            conn.rtt_max = rtt
+                        conn.rtt_sum += rtt
+                        conn.rtt_n += 1
 
-            if conn['syn_count'] >= 1 and conn['fin_count'] >= 1:
-                conn['is_complete'] = True
+                #Accurate packet and byte counts
+                conn.packets[direction] += 1
+                conn.bytes[direction] += payload_len
 
-            #Accurate packet and byte counts
-            if direction == 'src_to_dst':
-                conn['packets_src_to_dst'] += 1
-                conn['bytes_src_to_dst'] += (incl_len - 54)
-            else:
-                conn['packets_dst_to_src'] += 1
-                conn['bytes_dst_to_src'] += (incl_len - 54)
-
-            #Include zero window sizes
-            window_size = struct.unpack('!H', tcp_header[14:16])[0]
-            conn['window_sizes'].append(window_size)
+                #Include zero window sizes
+                if window_size < conn.win_min:
+                    conn.win_min = window_size
+                if window_size > conn.win_max:
+                    conn.win_max = window_size
+                conn.win_sum += window_size
 
     return connections
 
@@ -127,56 +210,73 @@ def calculate_statistics(connections):
     complete_connections = 0
     reset_connections = 0
     open_connections = 0
-    durations = []
-    packet_counts = []
-    window_sizes = []
-    rtt_times = []
+    #Typed arrays store each value unboxed in one contiguous buffer, instead of a
+    #list of pointers to separately allocated int/float objects
+    durations = array.array('d')
+    packet_counts = array.array('Q')
+    window_mins = array.array('L')
+    window_maxes = array.array('L')
+    window_total = 0
+    window_count = 0
+    rtt_mins = array.array('d')
+    rtt_maxes = array.array('d')
+    rtt_total = 0
+    rtt_count = 0
 
     #Analyze each connection to get the required values
     for conn in connections.values():
-        if conn['reset']:
+        if conn.reset:
             reset_connections += 1
 
-        if conn['is_complete']:
+        #A connection is complete once it has seen at least one SYN and one FIN
+        if conn.syn_count >= 1 and conn.fin_count >= 1:
             complete_connections += 1
             
             #Calculating the total time spent for the connection
-            if conn['start_time'] is not None and conn['end_time'] is not None:
-                duration = conn['end_time'] - conn['start_time']
+            if conn.start_time is not None and conn.end_time is not None:
+                duration = conn.end_time - conn.start_time
                 durations.append(duration)
                 total_duration += duration
 
             #Getting the amount of packets
-            packets = conn['packets_src_to_dst'] + conn['packets_dst_to_src']
+            packets = conn.packets[0] + conn.packets[1]
             packet_counts.append(packets)
             
-            #Getting the window size
-            window_sizes.extend(conn['window_sizes'])
+            #Getting the window size, one sample was taken per packet
+            window_mins.append(conn.win_min)
+            window_maxes.append(conn.win_max)
+            window_total += conn.win_sum
+            window_count += packets
             
         #Getting the open connections left
-        elif conn['syn_count'] >= 1 and conn['fin_count'] == 0:
+        elif conn.syn_count >= 1 and conn.fin_count == 0:
             open_connections += 1
             
         #Getting the RTT values
-        rtt_times.extend(conn['rtt_times'])
+        if conn.rtt_n:
+            rtt_mins.append(conn.rtt_min)
+            rtt_maxes.append(conn.rtt_max)
+            rtt_total += conn.rtt_sum
+            rtt_count += conn.rtt_n
         
 
     #Calculating and storing all the measurements got from the connection
-    min_duration = min(durations)
-    max_duration = max(durations)
+    #Captures without complete connections or RTT samples report 0 rather than failing
+    min_duration = min(durations, default=0)
+    max_duration = max(durations, default=0)
     mean_duration = total_duration / complete_connections if complete_connections else 0
 
-    min_rtt = min(rtt_times)
-    max_rtt = max(rtt_times)
-    mean_rtt = sum(rtt_times) / len(rtt_times) if rtt_times else 0
+    min_rtt = min(rtt_mins, default=0)
+    max_rtt = max(rtt_maxes, default=0)
+    mean_rtt = rtt_total / rtt_count if rtt_count else 0
 
-    min_packets = min(packet_counts)
-    max_packets = max(packet_counts)
+    min_packets = min(packet_counts, default=0)
+    max_packets = max(packet_counts, default=0)
     mean_packets = sum(packet_counts) / len(packet_counts) if packet_counts else 0
 
-    min_window_size = min(window_sizes)
-    max_window_size = max(window_sizes)
-    mean_window_size = sum(window_sizes) / len(window_sizes) if window_sizes else 0
+    min_window_size = min(window_mins, default=0)
+    max_window_size = max(window_maxes, default=0)
+    mean_window_size = window_total / window_count if window_count else 0
 
     return {
         'total_connections': len(connections),
@@ -206,38 +306,43 @@ def output_format(connections):
     print("________________________________________________")
     
     print("\nB) Connection's details\n")
+    #Each connection's block is formatted into one string and written in a single
+    #call, rather than ~18 print calls each taking the stdout lock (and flushing
+    #per line on a terminal)
+    write = sys.stdout.write
     for i, (conn, details) in enumerate(connections.items(), 1):
-        src_ip, src_port, dst_ip, dst_port = conn
-        print(f"Connection {i}:")
-        print(f"Source Address: {src_ip}")
-        print(f"Destination Address: {dst_ip}")
-        print(f"Source Port: {src_port}")
-        print(f"Destination Port: {dst_port}")
+        src_endpoint, dst_endpoint = conn >> 48, conn & 0xFFFFFFFFFFFF
+        src_ip, src_port = src_endpoint >> 16, src_endpoint & 0xFFFF
+        dst_ip, dst_port = dst_endpoint >> 16, dst_endpoint & 0xFFFF
         
-        start_time = details.get('start_time', 0.0) or 0.0
-        end_time = details.get('end_time', start_time) or start_time
+        start_time = details.start_time or 0.0
+        end_time = details.end_time or start_time
         duration = end_time - start_time
         
-        syn_count = details['syn_count']
-        fin_count = details['fin_count']
+        syn_count = details.syn_count
+        fin_count = details.fin_count
         status = f"S{syn_count}F{fin_count}"
         
-        print(f"Status: {status}")
-        print(f"Start time: {start_time} seconds")
-        print(f"End Time: {end_time} seconds")
-        print(f"Duration: {duration} seconds")
-        
-        packets_src_to_dst = details['packets_src_to_dst']
-        packets_dst_to_src = details['packets_dst_to_src']
-        bytes_src_to_dst = details['bytes_src_to_dst']
-        bytes_dst_to_src = details['bytes_dst_to_src']
-        print(f"Number of packets sent from Source to Destination: {packets_src_to_dst}")
-        print(f"Number of packets sent from Destination to Source: {packets_dst_to_src}")
-        print(f"Total number of packets: {packets_src_to_dst + packets_dst_to_src}")
-        print(f"Number of data bytes sent from Source to Destination: {bytes_src_to_dst}")
-        print(f"Number of data bytes sent from Destination to Source: {bytes_dst_to_src}")
-        print(f"Total number of data bytes: {bytes_src_to_dst + bytes_dst_to_src}")
-        print("END\n++++++++++++++++++++++++++++++++")
+        packets_src_to_dst, packets_dst_to_src = details.packets
+        bytes_src_to_dst, bytes_dst_to_src = details.bytes
+        write(
+            f"Connection {i}:\n"
+            f"Source Address: {socket.inet_ntoa(src_ip.to_bytes(4, 'big'))}\n"
+            f"Destination Address: {socket.inet_ntoa(dst_ip.to_bytes(4, 'big'))}\n"
+            f"Source Port: {src_port}\n"
+            f"Destination Port: {dst_port}\n"
+            f"Status: {status}\n"
+            f"Start time: {start_time} seconds\n"
+            f"End Time: {end_time} seconds\n"
+            f"Duration: {duration} seconds\n"
+            f"Number of packets sent from Source to Destination: {packets_src_to_dst}\n"
+            f"Number of packets sent from Destination to Source: {packets_dst_to_src}\n"
+            f"Total number of packets: {packets_src_to_dst + packets_dst_to_src}\n"
+            f"Number of data bytes sent from Source to Destination: {bytes_src_to_dst}\n"
+            f"Number of data bytes sent from Destination to Source: {bytes_dst_to_src}\n"
+            f"Total number of data bytes: {bytes_src_to_dst + bytes_dst_to_src}\n"
+            "END\n++++++++++++++++++++++++++++++++\n"
+        )
 
     print("\nC) General\n")
     print("Total number of complete TCP connections:", stats['complete_connections'])